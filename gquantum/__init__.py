@@ -1 +1,2 @@
 from gquantum.qubit import Qubit
+from gquantum.sharded import ShardedQubit
@@ -1,76 +1,289 @@
 """This module contains internal operations on amplitudes of qubits."""
 
+import heapq
 import numpy as np
+from types import MappingProxyType
+
+# Number of qubits spanned by one block when streaming over the amplitudes.
+_BLOCK_QUBITS = 20
+
+_SUPPORTED_DTYPES = (np.complex64, np.complex128)
+
+
+def _build_single_qubit_gates():
+    """Builds the read-only table of single qubit gates shared by all registers."""
+    gates = {
+        # Pauli-X / Not Gate
+        'X': np.array([
+            [0, 1],
+            [1, 0]
+        ]),
+        # Pauli-Y Gate
+        'Y': np.array([
+            [0, -1j],
+            [1j, 0]
+        ]),
+        # Pauli-Z Gate
+        'Z': np.array([
+            [1, 0],
+            [0, -1]
+        ]),
+        # Hadamard Gate
+        'H': np.multiply(1. / np.sqrt(2), np.array([
+            [1, 1],
+            [1, -1]
+        ])),
+        # Identity Gate
+        'Id': np.eye(2),
+        # S & S Dagger Gate
+        'S': np.array([
+            [1, 0],
+            [0, 1j]
+        ]),
+        'SDagger': np.array([
+            [1, 0],
+            [0, 1j]
+        ]).conjugate().transpose(),
+        # T & T Dagger / Pi over 8 Gate
+        'T': np.array([
+            [1, 0],
+            [0, np.e ** (1j * np.pi / 4.)]
+        ]),
+        'TDagger': np.array([
+            [1, 0],
+            [0, np.e ** (1j * np.pi / 4.)]
+        ]).conjugate().transpose()
+    }
+    for name in gates:
+        gates[name] = np.ascontiguousarray(gates[name], dtype=np.complex128)
+        gates[name].flags.writeable = False
+    return MappingProxyType(gates)
+
+
+_SINGLE_QUBIT_GATES = _build_single_qubit_gates()
 
 
 def _apply_gate(amplitudes, gate, target, control_list=[]):
     assert not target in control_list, 'Target qubit should not in control qubits list!'
     qubit_num = len(amplitudes.shape)
-    amplitudes_0 = "]"
-    amplitudes_1 = "]"
-    for i in range(qubit_num):
-        if i == (target):
-            amplitudes_0 = "0," + amplitudes_0
-            amplitudes_1 = "1," + amplitudes_1
-        elif (i) in control_list:
-            amplitudes_0 = "1," + amplitudes_0
-            amplitudes_1 = "1," + amplitudes_1
+    index_0 = [slice(None)] * qubit_num
+    for i in control_list:
+        index_0[qubit_num - i - 1] = 1
+    index_1 = list(index_0)
+    index_0[qubit_num - target - 1] = 0
+    index_1[qubit_num - target - 1] = 1
+    # the trailing Ellipsis keeps a view even when every axis is indexed
+    amplitudes_0 = amplitudes[tuple(index_0) + (Ellipsis,)]
+    amplitudes_1 = amplitudes[tuple(index_1) + (Ellipsis,)]
+    # cast the coefficients to the scalar type of the amplitudes, so nothing is upcast
+    scalar = amplitudes.dtype.type
+    g00, g01, g10, g11 = (scalar(gate[i, j]) for i, j in ((0, 0), (0, 1), (1, 0), (1, 1)))
+    if g01 == 0 and g10 == 0:
+        if g00 != 1:
+            amplitudes_0 *= g00
+        if g11 != 1:
+            amplitudes_1 *= g11
+        return
+    # the other gates mix the pair, so it is updated block by block through two small buffers
+    block_qubits = min(len(amplitudes_0.shape), _BLOCK_QUBITS)
+    outer_shape = amplitudes_0.shape[:len(amplitudes_0.shape) - block_qubits]
+    temp_amp_0 = np.empty((2,) * block_qubits, dtype=amplitudes.dtype)
+    temp_amp_1 = np.empty((2,) * block_qubits, dtype=amplitudes.dtype)
+    for outer_index in np.ndindex(*outer_shape):
+        block_0 = amplitudes_0[outer_index + (Ellipsis,)]
+        block_1 = amplitudes_1[outer_index + (Ellipsis,)]
+        np.multiply(block_0, g10, out=temp_amp_0)
+        if g00 == 0 and g11 == 0:
+            np.multiply(block_1, g01, out=block_0)
+            block_1[...] = temp_amp_0
         else:
-            amplitudes_0 = ":," + amplitudes_0
-            amplitudes_1 = ":," + amplitudes_1
-    amplitudes_0 = "amplitudes[" + amplitudes_0
-    amplitudes_1 = "amplitudes[" + amplitudes_1
-    temp_amp_1 = eval(amplitudes_1 + "*" + str(gate[1, 0]))
-    temp_amp_2 = eval(amplitudes_0 + "*" + str(gate[0, 1]))
-    exec(amplitudes_0 + " = " + amplitudes_0 + "*" + str(gate[0, 0]) + " + temp_amp_1")
-    exec(amplitudes_1 + " = " + amplitudes_1 + "*" + str(gate[1, 1]) + " + temp_amp_2")
+            np.multiply(block_1, g01, out=temp_amp_1)
+            block_0 *= g00
+            block_0 += temp_amp_1
+            block_1 *= g11
+            block_1 += temp_amp_0
 
 
-def _measure(amplitudes, measure_list = [0]):
+def _measure(amplitudes, measure_list=[0]):
     qubit_num = len(amplitudes.shape)
-    measure_list = qubit_num - np.array(measure_list) - 1
-    probablity_array = np.square(abs(amplitudes))
-    #to prevent measure list from too long
-    if len(measure_list)<21:
-        irrelevant_axes = np.array(list(set(range(qubit_num)) - set(measure_list)))
-        #to prevent irrelevant axes from too long
-        if(len(irrelevant_axes)>12):
-            probablity_array = probablity_array.sum(axis = tuple(irrelevant_axes[:12]))
-            target_probablity_array = probablity_array.sum(axis = tuple(irrelevant_axes[12:]-12))
-        else:
-            target_probablity_array = probablity_array.sum(axis = tuple(irrelevant_axes))
-        target_probablity_array = target_probablity_array.reshape(-1)
-        output_integer = np.random.choice(range(target_probablity_array.shape[0]), p = target_probablity_array.ravel())
-        output_binary = list(np.binary_repr(output_integer, width = len(measure_list)))
-    else:
-        irrelevant_axes1 = np.array(list(set(range(qubit_num)) - set(measure_list[:14])))
-        irrelevant_axes2 = np.array(list(set(range(qubit_num)) - set(measure_list[14:])))
-        target_probablity_array1 = probablity_array.sum(axis = tuple(irrelevant_axes1))
-        target_probablity_array2 = probablity_array.sum(axis = tuple(irrelevant_axes2))
-        target_probablity_array1 = target_probablity_array1.reshape(-1)
-        target_probablity_array2 = target_probablity_array2.reshape(-1)
-        output_integer1 = np.random.choice(range(target_probablity_array1.shape[0]), p = target_probablity_array1.ravel())
-        output_integer2 = np.random.choice(range(target_probablity_array2.shape[0]), p = target_probablity_array2.ravel())
-        output_binary1 = list(np.binary_repr(output_integer1, width = 14))
-        output_binary2 = list(np.binary_repr(output_integer2, width = len(measure_list)-14))
-        output_binary = output_binary2 + output_binary1
-    return output_binary
+    flat_amplitudes = amplitudes.reshape(-1)
+    block_size = 2 ** min(qubit_num, _BLOCK_QUBITS)
+    # a basis state is drawn from the cumulative probabilities, first over the
+    # sums of the blocks, then inside the block that holds it
+    block_sums = np.array([_squared_norm(flat_amplitudes[start:start + block_size])
+                           for start in range(0, flat_amplitudes.shape[0], block_size)])
+    block_index, fraction = _search_cumulative(np.cumsum(block_sums), np.random.random())
+    block = flat_amplitudes[block_index * block_size:(block_index + 1) * block_size]
+    probability_cumsum = np.cumsum(block.real ** 2 + block.imag ** 2, dtype=np.float64)
+    index_in_block, _ = _search_cumulative(probability_cumsum, fraction)
+    output_integer = block_index * block_size + index_in_block
+    return [str(output_integer >> i & 1) for i in sorted(measure_list, reverse=True)]
+
+
+def _search_cumulative(cumulative, fraction):
+    # returns the entry holding the given fraction of the total, and the fraction left inside it
+    target = fraction * cumulative[-1]
+    # rounding must never select an entry of zero probability after the last non-zero one
+    last_index = int(np.searchsorted(cumulative, cumulative[-1], side="left"))
+    index = min(int(np.searchsorted(cumulative, target, side="right")), last_index)
+    start = cumulative[index - 1] if index > 0 else 0.
+    size = cumulative[index] - start
+    return index, (min(max((target - start) / size, 0.), 1.) if size > 0 else 0.)
+
+
+def _squared_norm(amplitudes):
+    qubit_num = len(amplitudes.shape)
+    block_qubits = min(qubit_num, _BLOCK_QUBITS)
+    squared_norm = 0.
+    for outer_index in np.ndindex(*amplitudes.shape[:qubit_num - block_qubits]):
+        block = amplitudes[outer_index + (Ellipsis,)]
+        squared_norm += float(np.vdot(block, block).real)
+    return squared_norm
 
 
 def _collapse(amplitudes, measure_list, measure_result_list):
     measure_list.sort()
     measure_list.reverse()
     qubit_num = len(amplitudes.shape)
-    new_amplitudes = np.zeros_like(amplitudes)
-    amplitudes_parameter = "]"
-    for i in range(qubit_num):
-        if i in measure_list:
-            if measure_result_list[measure_list.index(i)] == "0":
-                amplitudes_parameter = "0," + amplitudes_parameter
+    index = [slice(None)] * qubit_num
+    for i, measure_result in zip(measure_list, measure_result_list):
+        other_index = [slice(None)] * qubit_num
+        other_index[qubit_num - i - 1] = 1 - int(measure_result)
+        amplitudes[tuple(other_index)] = 0
+        index[qubit_num - i - 1] = int(measure_result)
+    remaining_amplitudes = amplitudes[tuple(index) + (Ellipsis,)]
+    remaining_amplitudes *= np.finfo(amplitudes.dtype).dtype.type(1. / np.sqrt(_squared_norm(remaining_amplitudes)))
+
+
+def _top_probabilities(amplitudes, k):
+    qubit_num = len(amplitudes.shape)
+    flat_amplitudes = amplitudes.reshape(-1)
+    block_size = 2 ** min(qubit_num, _BLOCK_QUBITS)
+    heap = []
+    for start in range(0, flat_amplitudes.shape[0], block_size):
+        block = flat_amplitudes[start:start + block_size]
+        probability_block = block.real ** 2 + block.imag ** 2
+        # keep every entry tied with the k-th largest, so that ties go to the lowest index
+        threshold = np.partition(probability_block, -k)[-k] if k < probability_block.shape[0] else 0
+        if len(heap) == k:
+            threshold = max(threshold, heap[0][0])
+        candidates = np.flatnonzero(probability_block >= threshold)
+        # candidates are in ascending index order, so the stable sort breaks ties by index
+        candidates = candidates[np.argsort(-probability_block[candidates], kind="stable")[:k]]
+        for index in candidates:
+            item = (float(probability_block[index]), -(start + int(index)))
+            if len(heap) < k:
+                heapq.heappush(heap, item)
             else:
-                amplitudes_parameter = "1," + amplitudes_parameter
+                heapq.heappushpop(heap, item)
+    heap.sort(reverse=True)
+    return [(np.binary_repr(-index, width=qubit_num), probability) for probability, index in heap]
+
+
+def _get_amplitudes_by_bitstrings(amplitudes, bitstring_list):
+    qubit_num = len(amplitudes.shape)
+    flat_amplitudes = amplitudes.reshape(-1)
+    indices = np.zeros(len(bitstring_list), dtype=np.int64)
+    for i, bitstring in enumerate(bitstring_list):
+        assert len(bitstring) == qubit_num, 'Bitstring should have one bit for every qubit!'
+        assert set(bitstring) <= set("01"), 'Bitstring should only contain "0" and "1".'
+        indices[i] = int(bitstring, 2)
+    return flat_amplitudes[indices]
+
+
+def _reduced_density_matrix(amplitudes, qubit_list):
+    assert len(set(qubit_list)) == len(qubit_list), 'Qubits in the list should be different!'
+    qubit_num = len(amplitudes.shape)
+    # axes of the kept qubits, so that the first kept axis is the highest qubit
+    kept_axes = sorted(qubit_num - np.array(qubit_list, dtype=int) - 1)
+    # the last axes are kept whole in every block, the others are iterated over
+    block_axes = range(max(qubit_num - _BLOCK_QUBITS, 0), qubit_num)
+    outer_axes = [axis for axis in range(qubit_num) if axis not in block_axes and axis not in kept_axes]
+    dimension = 2 ** len(kept_axes)
+    density_matrix = np.zeros((dimension, dimension), dtype=amplitudes.dtype)
+    for outer_index in np.ndindex(*([2] * len(outer_axes))):
+        index = [slice(None)] * qubit_num
+        for axis, value in zip(outer_axes, outer_index):
+            index[axis] = value
+        remaining_axes = [axis for axis in range(qubit_num) if axis not in outer_axes]
+        kept_positions = [remaining_axes.index(axis) for axis in kept_axes]
+        block = amplitudes[tuple(index)]
+        block = np.moveaxis(block, kept_positions, range(len(kept_axes))).reshape(dimension, -1)
+        density_matrix += block @ block.conj().T
+    return density_matrix
+
+
+def _group_pauli_terms(hamiltonian):
+    # Z-only terms form the diagonal layer, single X/Y terms are summed per qubit,
+    # other terms are grouped so that every qubit sees one Pauli inside a group,
+    # then a group is diagonal after one basis change per qubit
+    diagonal_terms = []
+    single_qubit_terms = {}
+    groups = []
+    for coefficient, pauli_string, qubit_list in hamiltonian:
+        assert len(pauli_string) == len(qubit_list), 'Pauli string should have one Pauli for every qubit!'
+        assert set(pauli_string) <= set("IXYZ"), 'Pauli string should only contain "I, X, Y, Z".'
+        assert len(set(qubit_list)) == len(qubit_list), 'Qubits in a term should be different!'
+        term = {qubit: pauli for pauli, qubit in zip(pauli_string, qubit_list) if pauli != "I"}
+        if all(pauli == "Z" for pauli in term.values()):
+            diagonal_terms.append((coefficient, list(term)))
+        elif len(term) == 1:
+            (qubit, pauli), = term.items()
+            coefficients = single_qubit_terms.setdefault(qubit, {})
+            coefficients[pauli] = coefficients.get(pauli, 0) + coefficient
         else:
-            amplitudes_parameter = ":," + amplitudes_parameter
-    amplitudes_parameter = "[" + amplitudes_parameter
-    exec("new_amplitudes"+amplitudes_parameter+" = "+ "amplitudes" + amplitudes_parameter)
-    amplitudes[...] = new_amplitudes/np.linalg.norm(new_amplitudes)
+            for basis, z_terms in groups:
+                if all(basis.get(qubit, pauli) == pauli for qubit, pauli in term.items()):
+                    basis.update(term)
+                    z_terms.append((coefficient, list(term)))
+                    break
+            else:
+                groups.append((dict(term), [(coefficient, list(term))]))
+    return diagonal_terms, single_qubit_terms, groups
+
+
+def _single_qubit_evolution(pauli_coefficients, time):
+    # exp(-i t (a X + b Y + c Z)) = cos(r t) I - i sin(r t) / r (a X + b Y + c Z)
+    hamiltonian = sum(coefficient * _SINGLE_QUBIT_GATES[pauli] for pauli, coefficient in pauli_coefficients.items())
+    norm = np.sqrt(sum(coefficient ** 2 for coefficient in pauli_coefficients.values()))
+    if norm == 0:
+        return np.eye(2, dtype=np.complex128)
+    return np.cos(norm * time) * np.eye(2) - 1j * np.sin(norm * time) / norm * hamiltonian
+
+
+def _apply_diagonal_terms(amplitudes, z_terms, time):
+    qubit_num = len(amplitudes.shape)
+    block_qubits = min(qubit_num, _BLOCK_QUBITS)
+    outer_qubits = qubit_num - block_qubits
+    real_dtype = np.finfo(amplitudes.dtype).dtype
+    # split every term into its axes outside the block and a sign pattern inside it
+    block_terms = []
+    for coefficient, qubit_list in z_terms:
+        outer_axes = [qubit_num - qubit - 1 for qubit in qubit_list if qubit_num - qubit - 1 < outer_qubits]
+        signs = np.array(coefficient, dtype=real_dtype)
+        for qubit in qubit_list:
+            axis = qubit_num - qubit - 1 - outer_qubits
+            if axis >= 0:
+                shape = [1] * block_qubits
+                shape[axis] = 2
+                signs = signs * np.array([1, -1], dtype=real_dtype).reshape(shape)
+        block_terms.append((outer_axes, signs))
+    energies = np.empty((2,) * block_qubits, dtype=real_dtype)
+    phases = np.empty((2,) * block_qubits, dtype=amplitudes.dtype)
+    for outer_index in np.ndindex(*([2] * outer_qubits)):
+        energies[...] = 0
+        for outer_axes, signs in block_terms:
+            if sum(outer_index[axis] for axis in outer_axes) % 2:
+                energies -= signs
+            else:
+                energies += signs
+        energies *= real_dtype.type(-time)
+        np.cos(energies, out=phases.real)
+        np.sin(energies, out=phases.imag)
+        amplitudes[outer_index + (Ellipsis,)] *= phases
+
+
+def _diagonal_phases(qubit_num, z_terms, time, dtype):
+    phases = np.ones((2,) * qubit_num, dtype=dtype)
+    _apply_diagonal_terms(phases, z_terms, time)
+    return phases
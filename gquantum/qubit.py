@@ -7,7 +7,10 @@ class.
 """
 
 import numpy as np
-from gquantum.backend import _apply_gate, _collapse, _measure
+from gquantum.backend import _apply_gate, _collapse, _measure, _top_probabilities, \
+    _get_amplitudes_by_bitstrings, _reduced_density_matrix, _group_pauli_terms, _diagonal_phases, \
+    _apply_diagonal_terms, _single_qubit_evolution, \
+    _SINGLE_QUBIT_GATES, _SUPPORTED_DTYPES
 from collections import Counter
 
 class Qubit:
@@ -15,57 +18,27 @@ class Qubit:
 
     Attributes:
         num_qubits: The number of qubits in register.
+        dtype: The complex type of the amplitudes, complex64 or complex128.
         amplitudes: The amplitudes of qubits in register.
     """
 
-    def __init__(self, num_qubits):
-        """Initializes Qubit with the number of qubits."""
+    # the gate table is shared by all registers and cast to dtype inside the kernels
+    _single_qubit_gates = _SINGLE_QUBIT_GATES
+
+    def __init__(self, num_qubits, dtype=np.complex64):
+        """Initializes Qubit with the number of qubits.
+
+        Args:
+            num_qubits: The number of qubits in register.
+            dtype: complex64 halves the memory traffic of large registers,
+                complex128 keeps accuracy for small ones.
+        """
         assert num_qubits < 32, 'This lib support at most 31 qubits.'
+        assert np.dtype(dtype) in _SUPPORTED_DTYPES, 'dtype should be complex64 or complex128.'
         self.num_qubits = num_qubits
-        self.amplitudes = np.zeros((np.ones(num_qubits) * 2).astype(int).tolist()).astype(np.complex64)
-        self.amplitudes[tuple(np.zeros(num_qubits).astype(int)[:, np.newaxis].tolist())] = 1
-        self._single_qubit_gates = {
-            # Pauli-X / Not Gate
-            'X': np.matrix([
-                [0, 1],
-                [1, 0]
-            ]),
-            # Pauli-Y Gate
-            'Y': np.matrix([
-                [0, -1j],
-                [1j, 0]
-            ]),
-            # Pauli-Z Gate
-            'Z': np.matrix([
-                [1, 0],
-                [0, -1]
-            ]),
-            # Hadamard Gate
-            'H': np.multiply(1. / np.sqrt(2), np.matrix([
-                [1, 1],
-                [1, -1]
-            ])),
-            # Identity Gate
-            'Id': np.eye(2),
-            # S & S Dagger Gate
-            'S': np.matrix([
-                [1, 0],
-                [0, 1j]
-            ]),
-            'SDagger': np.matrix([
-                [1, 0],
-                [0, 1j]
-            ]).conjugate().transpose(),
-            # T & T Dagger / Pi over 8 Gate
-            'T': np.matrix([
-                [1, 0],
-                [0, np.e ** (1j * np.pi / 4.)]
-            ]),
-            'TDagger': np.matrix([
-                [1, 0],
-                [0, np.e ** (1j * np.pi / 4.)]
-            ]).conjugate().transpose()
-        }
+        self.dtype = np.dtype(dtype)
+        self.amplitudes = np.zeros((2,) * num_qubits, dtype=self.dtype)
+        self.amplitudes[(0,) * num_qubits] = 1
 
     def h(self, qubit_index):
         """Applies the Hadamard transformation to a qubit.
@@ -324,6 +297,82 @@ class Qubit:
         ])
         _apply_gate(self.amplitudes, gate_matrix, qubit_index, control_index_list)
 
+    def evolve(self, hamiltonian, time, steps=1, order=1):
+        """Evolves the qubits under a Hamiltonian with the Trotter formula.
+
+        The terms are split into layers. Z-only terms form one diagonal layer,
+        applied as a single phase vector precomputed once per call. Single
+        qubit X/Y terms become one rotation per qubit. The other terms are
+        grouped so that every qubit sees one Pauli, and each group is rotated
+        to the Z basis and applied as phases computed block by block. Basis
+        changes and rotations on the same qubit are fused into one gate, also
+        across steps, so a step costs a few passes over the amplitudes.
+
+        Args:
+            hamiltonian: List of terms (coefficient, pauli_string, qubit_index_list),
+                e.g. [(1.0, "ZZ", [0, 1]), (0.5, "X", [0])] for Z0 Z1 + 0.5 X0.
+            time: Total evolution time.
+            steps: Number of Trotter steps.
+            order: 1 for the first order formula, 2 for the symmetric
+                second order formula.
+        """
+        assert order in (1, 2), 'Trotter order should be 1 or 2.'
+        assert steps > 0, 'steps should be a positive integer.'
+        diagonal_terms, single_qubit_terms, groups = _group_pauli_terms(hamiltonian)
+        layers = [("diagonal", diagonal_terms)] if diagonal_terms else []
+        layers += [("single", single_qubit_terms)] if single_qubit_terms else []
+        layers += [("group", group) for group in groups]
+        if not layers:
+            return
+        step_time = time / steps
+        if order == 1:
+            sequence = [(layer, step_time) for layer in layers]
+        else:
+            half_sequence = [(layer, step_time / 2) for layer in layers[:-1]]
+            sequence = half_sequence + [(layers[-1], step_time)] + half_sequence[::-1]
+        # the diagonal layer is first, so it has one duration in both formulas
+        diagonal_phases = None
+        if diagonal_terms:
+            diagonal_phases = _diagonal_phases(self.num_qubits, diagonal_terms, sequence[0][1], self.dtype)
+        to_z = {
+            "X": self._single_qubit_gates["H"],
+            "Y": np.matmul(self._single_qubit_gates["H"], self._single_qubit_gates["SDagger"]),
+            "Z": self._single_qubit_gates["Id"],
+        }
+        from_z = {
+            "X": self._single_qubit_gates["H"],
+            "Y": np.matmul(self._single_qubit_gates["S"], self._single_qubit_gates["H"]),
+            "Z": self._single_qubit_gates["Id"],
+        }
+        identity = self._single_qubit_gates["Id"]
+        # single qubit gates not applied yet, fused with the next ones on the same qubit
+        pending_gates = {}
+
+        def flush(qubit_list):
+            for qubit in qubit_list:
+                gate = pending_gates.pop(qubit, None)
+                if gate is not None and not np.allclose(gate, identity):
+                    _apply_gate(self.amplitudes, gate, qubit)
+
+        for _ in range(steps):
+            for (kind, terms), layer_time in sequence:
+                if kind == "diagonal":
+                    flush({qubit for _, qubit_list in terms for qubit in qubit_list})
+                    self.amplitudes *= diagonal_phases
+                elif kind == "single":
+                    for qubit, pauli_coefficients in terms.items():
+                        gate = _single_qubit_evolution(pauli_coefficients, layer_time)
+                        pending_gates[qubit] = np.matmul(gate, pending_gates.get(qubit, identity))
+                else:
+                    basis, z_terms = terms
+                    for qubit, pauli in basis.items():
+                        pending_gates[qubit] = np.matmul(to_z[pauli], pending_gates.get(qubit, identity))
+                    flush(basis)
+                    _apply_diagonal_terms(self.amplitudes, z_terms, layer_time)
+                    for qubit, pauli in basis.items():
+                        pending_gates[qubit] = from_z[pauli]
+        flush(list(pending_gates))
+
     def reset(self, qubit_index):
         """Reset a qubit to |0>.
 
@@ -340,8 +389,8 @@ class Qubit:
 
     def reset_all(self):
         """Reset all qubits to |0>."""
-        self.amplitudes = np.zeros((np.ones(self.num_qubits) * 2).astype(int).tolist()).astype(np.complex64)
-        self.amplitudes[tuple(np.zeros(self.num_qubits).astype(int)[:, np.newaxis].tolist())] = 1
+        self.amplitudes = np.zeros((2,) * self.num_qubits, dtype=self.dtype)
+        self.amplitudes[(0,) * self.num_qubits] = 1
 
     def measure(self, qubit_index):
         """Performs a measurement of a single qubit in computational(Pauli Z) basis.
@@ -455,6 +504,60 @@ class Qubit:
         """
         return self.amplitudes
 
+    def simulator_func_top_probabilities(self, k):
+        """Returns the k most likely measurement outcomes of all qubits.
+
+        The amplitudes are scanned block by block with a bounded heap, so no
+        full-size probability array is created.
+
+        This function is not directly performable on a real quantum computer.
+
+        Args:
+            k: Number of outcomes to return.
+
+        Returns:
+            A list of (state, probability) tuples sorted by descending
+            probability. The qubits represented are in descending order.
+
+            example:
+
+            [('00', 0.5), ('11', 0.5)]
+        """
+        assert k > 0, 'k should be a positive integer.'
+        return _top_probabilities(self.amplitudes, k)
+
+    def simulator_func_get_amplitudes_by_bitstrings(self, bitstring_list):
+        """Returns the amplitudes of several computational basis states.
+
+        This function is not directly performable on a real quantum computer.
+
+        Args:
+            bitstring_list: List of states as type string, with one bit for
+                every qubit in descending order, e.g. ['00', '11'].
+
+        Returns:
+            An array with the amplitude of each state in bitstring_list.
+        """
+        return _get_amplitudes_by_bitstrings(self.amplitudes, bitstring_list)
+
+    def simulator_func_reduced_density_matrix(self, qubit_index_list):
+        """Returns the reduced density matrix of a few qubits.
+
+        The other qubits are traced out block by block, so only the blocks
+        and the resulting matrix are held in memory.
+
+        This function is not directly performable on a real quantum computer.
+
+        Args:
+            qubit_index_list: List of indices of qubits to be kept,
+                the index in this list should starts from 0.
+
+        Returns:
+            A square array of size 2 ** len(qubit_index_list). Its basis states
+            represent the kept qubits in descending order.
+        """
+        return _reduced_density_matrix(self.amplitudes, qubit_index_list)
+
     def simulator_func_save_amplitudes(self, file="amplitudes.npy"):
         """Save the amplitudes of this quantum register to a file.
 
@@ -473,5 +576,8 @@ class Qubit:
         Args:
             file: Path to the file to load amplitudes.
         """
-        self.amplitudes = np.load(file)
+        amplitudes = np.load(file)
+        assert amplitudes.dtype in _SUPPORTED_DTYPES, 'Amplitudes should be complex64 or complex128.'
+        self.amplitudes = amplitudes
         self.num_qubits = len(self.amplitudes.shape)
+        self.dtype = self.amplitudes.dtype
@@ -0,0 +1,494 @@
+"""This module contains a quantum register sharded across worker processes.
+
+The amplitudes are split by the top qubit indices (the global qubits) into
+shards. Every shard lives in its own shared memory segment, owned by a worker
+process pinned to a NUMA node when the machine exposes one. Gates on local
+qubits run inside the workers without communication. A gate on a global qubit
+first swaps that qubit with a local one by exchanging data between pairs of
+shards.
+"""
+
+import glob
+import multiprocessing
+import os
+import numpy as np
+from multiprocessing import resource_tracker, shared_memory
+from gquantum.backend import _apply_gate, _BLOCK_QUBITS, _SINGLE_QUBIT_GATES, _SUPPORTED_DTYPES
+
+
+def _numa_node_cpus():
+    node_cpus = []
+    for path in sorted(glob.glob("/sys/devices/system/node/node[0-9]*/cpulist")):
+        with open(path) as f:
+            cpulist = f.read().strip()
+        cpus = set()
+        for cpu_range in cpulist.split(","):
+            if not cpu_range:
+                continue
+            first, _, last = cpu_range.partition("-")
+            cpus.update(range(int(first), int(last or first) + 1))
+        if cpus:
+            node_cpus.append(cpus)
+    return node_cpus
+
+
+def _qubit_slice(qubit_num, qubit_index, value):
+    index = [slice(None)] * qubit_num
+    index[qubit_num - qubit_index - 1] = value
+    # the trailing Ellipsis keeps a view even when every axis is indexed
+    return tuple(index) + (Ellipsis,)
+
+
+def _attach_segment(name, shape, dtype):
+    segment = shared_memory.SharedMemory(name=name)
+    return segment, np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+
+
+def _run_shard_command(amplitudes, partners, message):
+    local_qubit_num = len(amplitudes.shape)
+    command = message[0]
+    real_scalar = np.finfo(amplitudes.dtype).dtype.type
+    if command == "gate":
+        _, gate, target, control_list = message
+        _apply_gate(amplitudes, gate, target, control_list)
+    elif command == "exchange":
+        _, partner_name, qubit_index = message
+        if partner_name not in partners:
+            partners[partner_name] = _attach_segment(partner_name, amplitudes.shape, amplitudes.dtype)
+        own_part = amplitudes[_qubit_slice(local_qubit_num, qubit_index, 1)]
+        partner_part = partners[partner_name][1][_qubit_slice(local_qubit_num, qubit_index, 0)]
+        # the halves are swapped block by block through one small buffer
+        block_qubits = min(len(own_part.shape), _BLOCK_QUBITS)
+        outer_shape = own_part.shape[:len(own_part.shape) - block_qubits]
+        temp_amp = np.empty((2,) * block_qubits, dtype=amplitudes.dtype)
+        for outer_index in np.ndindex(*outer_shape):
+            own_block = own_part[outer_index + (Ellipsis,)]
+            partner_block = partner_part[outer_index + (Ellipsis,)]
+            temp_amp[...] = own_block
+            own_block[...] = partner_block
+            partner_block[...] = temp_amp
+    elif command == "probability":
+        _, qubit_index = message
+        total = float(np.vdot(amplitudes, amplitudes).real)
+        if qubit_index is None:
+            return total, total
+        part = amplitudes[_qubit_slice(local_qubit_num, qubit_index, 1)]
+        return total, float(np.vdot(part, part).real)
+    elif command == "collapse":
+        _, qubit_index, value, scale = message
+        amplitudes[_qubit_slice(local_qubit_num, qubit_index, 1 - value)] = 0
+        amplitudes[_qubit_slice(local_qubit_num, qubit_index, value)] *= real_scalar(scale)
+    elif command == "scale":
+        _, scale = message
+        amplitudes *= real_scalar(scale)
+    return None
+
+
+def _shard_worker(conn, shard_index, local_qubit_num, dtype, cpus):
+    if cpus and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, cpus)
+        except OSError:
+            pass
+    itemsize = np.dtype(dtype).itemsize
+    # the segment is created and zeroed here, so its pages are first touched on this node
+    segment = shared_memory.SharedMemory(create=True, size=(2 ** local_qubit_num) * itemsize)
+    amplitudes = np.ndarray((2,) * local_qubit_num, dtype=dtype, buffer=segment.buf)
+    amplitudes[...] = 0
+    if shard_index == 0:
+        amplitudes[(0,) * local_qubit_num] = 1
+    conn.send(segment.name)
+    partners = {}
+    message = conn.recv()
+    while message[0] != "close":
+        conn.send(_run_shard_command(amplitudes, partners, message))
+        message = conn.recv()
+    del amplitudes
+    for name in list(partners):
+        partner_segment = partners.pop(name)[0]
+        partner_segment.close()
+    segment.close()
+    segment.unlink()
+    conn.send(None)
+    conn.close()
+
+
+class ShardedQubit:
+    """Creates qubits register sharded across worker processes.
+
+    Qubit indices used by the gates are always the logical ones. Internally
+    every logical qubit sits at a physical position: the positions below
+    num_local_qubits index the amplitudes inside a shard, the others index
+    the shards. Gates on a global position first swap it into the local range.
+
+    Attributes:
+        num_qubits: The number of qubits in register.
+        num_global_qubits: The number of qubits indexing the shards.
+        num_local_qubits: The number of qubits inside every shard.
+        dtype: The complex type of the amplitudes, complex64 or complex128.
+    """
+
+    def __init__(self, num_qubits, num_global_qubits=1, dtype=np.complex64):
+        """Initializes ShardedQubit with 2 ** num_global_qubits worker processes.
+
+        Args:
+            num_qubits: The number of qubits in register.
+            num_global_qubits: The number of qubits indexing the shards.
+            dtype: The complex type of the amplitudes, complex64 or complex128.
+        """
+        assert num_qubits < 32, 'This lib support at most 31 qubits.'
+        assert 0 < num_global_qubits < num_qubits, 'Global qubits should be between 1 and num_qubits - 1.'
+        assert np.dtype(dtype) in _SUPPORTED_DTYPES, 'dtype should be complex64 or complex128.'
+        self.num_qubits = num_qubits
+        self.dtype = np.dtype(dtype)
+        self.num_global_qubits = num_global_qubits
+        self.num_local_qubits = num_qubits - num_global_qubits
+        self._physical = list(range(num_qubits))
+        self._connections = []
+        self._workers = []
+        self._segments = []
+        node_cpus = _numa_node_cpus()
+        # workers share one tracker, so segments attached by other processes are not reported as leaked
+        resource_tracker.ensure_running()
+        for shard_index in range(2 ** num_global_qubits):
+            cpus = node_cpus[shard_index % len(node_cpus)] if node_cpus else None
+            parent_conn, child_conn = multiprocessing.Pipe()
+            worker = multiprocessing.Process(
+                target=_shard_worker,
+                args=(child_conn, shard_index, self.num_local_qubits, self.dtype.str, cpus),
+                daemon=True)
+            worker.start()
+            child_conn.close()
+            self._connections.append(parent_conn)
+            self._workers.append(worker)
+        self._segment_names = [conn.recv() for conn in self._connections]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Stops the worker processes and frees the shared memory segments."""
+        for segment in self._segments:
+            segment.close()
+        self._segments = []
+        for conn in self._connections:
+            conn.send(("close",))
+        for conn, worker in zip(self._connections, self._workers):
+            conn.recv()
+            conn.close()
+            worker.join()
+        self._connections = []
+        self._workers = []
+
+    def _run(self, shard_list, message_list):
+        for shard_index, message in zip(shard_list, message_list):
+            self._connections[shard_index].send(message)
+        return [self._connections[shard_index].recv() for shard_index in shard_list]
+
+    def _swap_to_local(self, qubit_index, busy_index_list):
+        """Swaps a global qubit with a local one by exchanging half of every pair of shards."""
+        global_position = self._physical[qubit_index]
+        busy_positions = [self._physical[i] for i in busy_index_list]
+        # a local control is only swapped out when no other local qubit is left,
+        # a control on a global qubit still works by selecting shards
+        local_positions = [p for p in range(self.num_local_qubits) if p not in busy_positions]
+        local_position = (local_positions or range(self.num_local_qubits))[-1]
+        shard_bit = 1 << (global_position - self.num_local_qubits)
+        shard_list = [s for s in range(2 ** self.num_global_qubits) if not s & shard_bit]
+        self._run(shard_list, [("exchange", self._segment_names[s | shard_bit], local_position)
+                               for s in shard_list])
+        local_qubit_index = self._physical.index(local_position)
+        self._physical[local_qubit_index] = global_position
+        self._physical[qubit_index] = local_position
+
+    def _apply(self, gate, qubit_index, control_index_list=()):
+        assert not qubit_index in control_index_list, 'Target qubit should not in control qubits list!'
+        if self._physical[qubit_index] >= self.num_local_qubits:
+            self._swap_to_local(qubit_index, control_index_list)
+        control_positions = [self._physical[i] for i in control_index_list]
+        local_controls = [p for p in control_positions if p < self.num_local_qubits]
+        shard_mask = sum(1 << (p - self.num_local_qubits) for p in control_positions
+                         if p >= self.num_local_qubits)
+        # controls on global qubits only select the shards, without any communication
+        shard_list = [s for s in range(2 ** self.num_global_qubits) if s & shard_mask == shard_mask]
+        self._run(shard_list, [("gate", gate, self._physical[qubit_index], local_controls)] * len(shard_list))
+
+    def h(self, qubit_index):
+        """Applies the Hadamard transformation to a qubit.
+
+        Args:
+            qubit_index: Index of qubit to which the gate should be applied, starts from 0.
+        """
+        self._apply(_SINGLE_QUBIT_GATES["H"], qubit_index)
+
+    def x(self, qubit_index):
+        """Applies the Pauli X gate to a qubit.
+
+        Args:
+            qubit_index: Index of qubit to which the gate should be applied, starts from 0.
+        """
+        self._apply(_SINGLE_QUBIT_GATES["X"], qubit_index)
+
+    def y(self, qubit_index):
+        """Applies the Pauli Y gate to a qubit.
+
+        Args:
+            qubit_index: Index of qubit to which the gate should be applied, starts from 0.
+        """
+        self._apply(_SINGLE_QUBIT_GATES["Y"], qubit_index)
+
+    def z(self, qubit_index):
+        """Applies the Pauli Z gate to a qubit.
+
+        Args:
+            qubit_index: Index of qubit to which the gate should be applied, starts from 0.
+        """
+        self._apply(_SINGLE_QUBIT_GATES["Z"], qubit_index)
+
+    def s(self, qubit_index):
+        """Applies the π/4 phase gate to a qubit.
+
+        Args:
+            qubit_index: Index of qubit to which the gate should be applied, starts from 0.
+        """
+        self._apply(_SINGLE_QUBIT_GATES["S"], qubit_index)
+
+    def t(self, qubit_index):
+        """Applies the π/8 phase gate to a qubit.
+
+        Args:
+            qubit_index: Index of qubit to which the gate should be applied, starts from 0.
+        """
+        self._apply(_SINGLE_QUBIT_GATES["T"], qubit_index)
+
+    def id(self, qubit_index):
+        """Applies the Identity gate to a qubit.
+
+        Args:
+            qubit_index: Index of qubit to which the gate should be applied, starts from 0.
+        """
+        self._apply(_SINGLE_QUBIT_GATES["Id"], qubit_index)
+
+    def s_dagger(self, qubit_index):
+        """Applies the adjoint of S gate to a qubit.
+
+        Args:
+            qubit_index: Index of qubit to which the gate should be applied, starts from 0.
+        """
+        self._apply(_SINGLE_QUBIT_GATES["SDagger"], qubit_index)
+
+    def t_dagger(self, qubit_index):
+        """Applies the adjoint of T gate to a qubit.
+
+        Args:
+            qubit_index: Index of qubit to which the gate should be applied, starts from 0.
+        """
+        self._apply(_SINGLE_QUBIT_GATES["TDagger"], qubit_index)
+
+    def rx(self, theta, qubit_index):
+        """Applies the RX gate to a qubit.
+
+        The RX gate manipulates a qubit as a rotation with an angle theta
+        about X-axis.
+
+        Args:
+            theta: Angle about which the qubit is to be rotated.
+            qubit_index: Index of qubit to which the gate should be applied, starts from 0.
+        """
+        self.multi_controlled_rx(theta, qubit_index, [])
+
+    def ry(self, theta, qubit_index):
+        """Applies the RY gate to a qubit.
+
+        The RY gate manipulates a qubit as a rotation with an angle theta
+        about Y-axis.
+
+        Args:
+            theta: Angle about which the qubit is to be rotated.
+            qubit_index: Index of qubit to which the gate should be applied, starts from 0.
+        """
+        self.multi_controlled_ry(theta, qubit_index, [])
+
+    def rz(self, theta, qubit_index):
+        """Applies the RZ gate to a qubit.
+
+        The RZ gate manipulates a qubit as a rotation with an angle theta
+        about Z-axis.
+
+        Args:
+            theta: Angle about which the qubit is to be rotated.
+            qubit_index: Index of qubit to which the gate should be applied, starts from 0.
+        """
+        self.multi_controlled_rz(theta, qubit_index, [])
+
+    def cx(self, control_index, target_index):
+        """Applies the controlled-NOT(CX) gate to a pair of qubits.
+
+        Args:
+            control_index: Index of the control qubit, starts from 0.
+            target_index: Index of the target qubit, starts from 0.
+        """
+        self._apply(_SINGLE_QUBIT_GATES["X"], target_index, [control_index])
+
+    def cnot(self, control_index, target_index):
+        """Applies the controlled-NOT(CNOT) gate to a pair of qubits.
+
+        Args:
+            control_index: Index of the control qubit, starts from 0.
+            target_index: Index of the target qubit, starts from 0.
+        """
+        self._apply(_SINGLE_QUBIT_GATES["X"], target_index, [control_index])
+
+    def toffoli(self, control_index_1, control_index_2, target_index):
+        """Applies the toffoli(CCNOT) gate to three qubits.
+
+        Args:
+            control_index_1: Index of the first control qubit, starts from 0.
+            control_index_2: Index of the second control qubit, starts from 0.
+            target_index: Index of the target qubit, starts from 0.
+        """
+        self._apply(_SINGLE_QUBIT_GATES["X"], target_index, [control_index_1, control_index_2])
+
+    def ccnot(self, control_index_1, control_index_2, target_index):
+        """Applies the CCNOT(toffoli) gate to three qubits.
+
+        Args:
+            control_index_1: Index of the first control qubit, starts from 0.
+            control_index_2: Index of the second control qubit, starts from 0.
+            target_index: Index of the target qubit, starts from 0.
+        """
+        self._apply(_SINGLE_QUBIT_GATES["X"], target_index, [control_index_1, control_index_2])
+
+    def swap(self, qubit_1_index, qubit_2_index):
+        """Applies the SWAP gate to a pair of qubits.
+
+        Only the physical positions of the two qubits are exchanged, so no
+        amplitude is moved.
+
+        Args:
+            qubit_1_index: Index of the first qubit to be swapped, starts from 0.
+            qubit_2_index: Index of the second qubit to be swapped, starts from 0.
+        """
+        assert qubit_1_index != qubit_2_index, 'Qubits to be swapped should be different!'
+        self._physical[qubit_1_index], self._physical[qubit_2_index] = \
+            self._physical[qubit_2_index], self._physical[qubit_1_index]
+
+    def multi_controlled_gate(self, gate, qubit_index, control_index_list):
+        """Applies a specific gate to a qubit with controls of other qubits.
+
+        Args:
+            gate: Specific gate to be executed. comes from
+                "X, Y, Z, H, S, T, Id, SDagger, TDagger".
+            qubit_index: Index of the target qubit, starts from 0.
+            control_index_list: List of indices of the control qubits,
+                the index in this list should starts from 0.
+        """
+        assert gate in _SINGLE_QUBIT_GATES.keys(), \
+            'Gate should be one from "X, Y, Z, H, S, T, Id, SDagger, TDagger"'
+        self._apply(_SINGLE_QUBIT_GATES[gate], qubit_index, control_index_list)
+
+    def multi_controlled_rx(self, theta, qubit_index, control_index_list):
+        """Applies the RX gate to a qubit with controls of other qubits.
+
+        The RX gate manipulates a qubit as a rotation with an angle theta
+        about X-axis.
+
+        Args:
+            theta: Angle about which the qubit is to be rotated.
+            qubit_index: Index of the target qubit, starts from 0.
+            control_index_list: List of indices of the control qubits,
+                the index in this list should starts from 0.
+        """
+        gate_matrix = np.array([
+            [np.cos(theta / 2), -1j * np.sin(theta / 2)],
+            [-1j * np.sin(theta / 2), np.cos(theta / 2)]
+        ])
+        self._apply(gate_matrix, qubit_index, control_index_list)
+
+    def multi_controlled_ry(self, theta, qubit_index, control_index_list):
+        """Applies the RY gate to a qubit with controls of other qubits.
+
+        The RY gate manipulates a qubit as a rotation with an angle theta
+        about Y-axis.
+
+        Args:
+            theta: Angle about which the qubit is to be rotated.
+            qubit_index: Index of the target qubit, starts from 0.
+            control_index_list: List of indices of the control qubits,
+                the index in this list should starts from 0.
+        """
+        gate_matrix = np.array([
+            [np.cos(theta / 2), -np.sin(theta / 2)],
+            [np.sin(theta / 2), np.cos(theta / 2)]
+        ])
+        self._apply(gate_matrix, qubit_index, control_index_list)
+
+    def multi_controlled_rz(self, theta, qubit_index, control_index_list):
+        """Applies the RZ gate to a qubit with controls of other qubits.
+
+        The RZ gate manipulates a qubit as a rotation with an angle theta
+        about Z-axis.
+
+        Args:
+            theta: Angle about which the qubit is to be rotated.
+            qubit_index: Index of the target qubit, starts from 0.
+            control_index_list: List of indices of the control qubits,
+                the index in this list should starts from 0.
+        """
+        gate_matrix = np.array([
+            [np.exp(-1j * theta / 2), 0],
+            [0, np.exp(1j * theta / 2)]
+        ])
+        self._apply(gate_matrix, qubit_index, control_index_list)
+
+    def measure(self, qubit_index):
+        """Performs a measurement of a single qubit in computational(Pauli Z) basis.
+
+        Every shard reports its partial sums, which are combined here before
+        the outcome is drawn and the shards are collapsed.
+
+        Args:
+            qubit_index: Index of qubit to be measured, starts from 0.
+
+        Returns:
+            "0" or "1" as type string. Represent the state |0> and |1> .
+        """
+        position = self._physical[qubit_index]
+        shard_list = list(range(2 ** self.num_global_qubits))
+        if position < self.num_local_qubits:
+            partial_sums = self._run(shard_list, [("probability", position)] * len(shard_list))
+            total = sum(s[0] for s in partial_sums)
+            probability_1 = sum(s[1] for s in partial_sums) / total
+        else:
+            shard_bit = 1 << (position - self.num_local_qubits)
+            partial_sums = self._run(shard_list, [("probability", None)] * len(shard_list))
+            total = sum(s[0] for s in partial_sums)
+            probability_1 = sum(s[0] for i, s in enumerate(partial_sums) if i & shard_bit) / total
+        value = int(np.random.random() < probability_1)
+        scale = 1. / np.sqrt(total * (probability_1 if value else 1. - probability_1))
+        if position < self.num_local_qubits:
+            self._run(shard_list, [("collapse", position, value, scale)] * len(shard_list))
+        else:
+            self._run(shard_list, [("scale", scale if bool(s & shard_bit) == bool(value) else 0.)
+                                   for s in shard_list])
+        return str(value)
+
+    def simulator_func_get_amplitudes(self):
+        """Returns a copy of the amplitudes of this quantum register.
+
+        The shards are gathered into one array in logical qubit order, so
+        this is only meant for registers that fit in one process.
+
+        This function is not directly performable on a real quantum computer.
+        """
+        if not self._segments:
+            self._segments = [shared_memory.SharedMemory(name=name) for name in self._segment_names]
+        shard_size = 2 ** self.num_local_qubits
+        amplitudes = np.stack([np.ndarray((shard_size,), dtype=self.dtype, buffer=segment.buf).copy()
+                               for segment in self._segments])
+        amplitudes = amplitudes.reshape((2,) * self.num_qubits)
+        axes = [self.num_qubits - self._physical[self.num_qubits - axis - 1] - 1 for axis in range(self.num_qubits)]
+        return np.ascontiguousarray(amplitudes.transpose(axes))
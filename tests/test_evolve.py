@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+import gquantum.backend as backend
+import gquantum.qubit
+from gquantum import Qubit
+
+_PAULIS = {
+    "I": np.eye(2),
+    "X": np.array([[0, 1], [1, 0]]),
+    "Y": np.array([[0, -1j], [1j, 0]]),
+    "Z": np.diag([1, -1]),
+}
+
+NUM_QUBITS = 4
+ISING = [(1.0, "ZZ", [i, i + 1]) for i in range(NUM_QUBITS - 1)] + \
+    [(0.7, "X", [i]) for i in range(NUM_QUBITS)] + [(0.3, "Z", [2])]
+HEISENBERG = [(0.8, pauli * 2, [i, i + 1]) for pauli in "XYZ" for i in range(NUM_QUBITS - 1)] + \
+    [(0.4, "Y", [1]), (0.3, "X", [1]), (0.2, "XIZ", [0, 1, 3]), (0.3, "YZ", [0, 2]), (0.5, "I", [2])]
+
+
+def _dense_hamiltonian(num_qubits, hamiltonian):
+    matrix = np.zeros((2 ** num_qubits, 2 ** num_qubits), dtype=np.complex128)
+    for coefficient, pauli_string, qubit_list in hamiltonian:
+        operators = [_PAULIS["I"]] * num_qubits
+        for pauli, qubit in zip(pauli_string, qubit_list):
+            operators[num_qubits - qubit - 1] = _PAULIS[pauli]
+        term = np.array([[1]])
+        for operator in operators:
+            term = np.kron(term, operator)
+        matrix += coefficient * term
+    return matrix
+
+
+def _initial_qubit(dtype=np.complex128):
+    qubit = Qubit(NUM_QUBITS, dtype=dtype)
+    for i in range(NUM_QUBITS):
+        qubit.ry(0.3 + i, i)
+    qubit.cnot(0, 3)
+    return qubit
+
+
+def _exact(qubit, hamiltonian, time):
+    energies, vectors = np.linalg.eigh(_dense_hamiltonian(qubit.num_qubits, hamiltonian))
+    state = qubit.amplitudes.reshape(-1).astype(np.complex128)
+    return vectors @ (np.exp(-1j * energies * time) * (vectors.conj().T @ state))
+
+
+@pytest.mark.parametrize("hamiltonian", [ISING, HEISENBERG], ids=["ising", "heisenberg"])
+@pytest.mark.parametrize("order", [1, 2])
+@pytest.mark.parametrize("block_qubits", [20, 2])
+def test_trotter_error_order(monkeypatch, hamiltonian, order, block_qubits):
+    monkeypatch.setattr(backend, "_BLOCK_QUBITS", block_qubits)
+    errors = []
+    for steps in (10, 20):
+        qubit = _initial_qubit()
+        exact = _exact(qubit, hamiltonian, 1.0)
+        qubit.evolve(hamiltonian, 1.0, steps, order)
+        errors.append(np.linalg.norm(qubit.amplitudes.reshape(-1) - exact))
+    assert errors[0] < 0.2
+    assert np.isclose(errors[0] / errors[1], 2 ** order, rtol=0.1)
+
+
+@pytest.mark.parametrize("order", [1, 2])
+def test_commuting_terms_are_exact(order):
+    hamiltonian = [(0.9, "ZZ", [0, 3]), (-0.4, "Z", [1]), (1.1, "ZZZ", [0, 1, 2])]
+    qubit = _initial_qubit()
+    exact = _exact(qubit, hamiltonian, 0.7)
+    qubit.evolve(hamiltonian, 0.7, 1, order)
+    assert np.allclose(qubit.amplitudes.reshape(-1), exact)
+
+
+@pytest.mark.parametrize("order", [1, 2])
+def test_empty_hamiltonian(order):
+    qubit = _initial_qubit()
+    amplitudes = qubit.amplitudes.copy()
+    qubit.evolve([], 1.0, 3, order)
+    assert np.array_equal(qubit.amplitudes, amplitudes)
+
+
+def test_keeps_dtype():
+    qubit = _initial_qubit(np.complex64)
+    qubit.evolve(HEISENBERG, 0.5, 4, 2)
+    assert qubit.amplitudes.dtype == np.complex64
+    assert np.isclose(np.linalg.norm(qubit.amplitudes), 1, atol=1e-5)
+
+
+def test_ising_passes_per_step(monkeypatch):
+    qubit = _initial_qubit()
+    calls = []
+    apply_gate = gquantum.qubit._apply_gate
+    monkeypatch.setattr(gquantum.qubit, "_apply_gate", lambda *args: calls.append(args) or apply_gate(*args))
+    qubit.evolve(ISING, 1.0, 5, 1)
+    # one fused rotation per qubit per step, besides the diagonal phase multiply
+    assert len(calls) == 5 * NUM_QUBITS
+
+
+def test_basis_changes_are_fused(monkeypatch):
+    hamiltonian = [(0.8, "XX", [0, 1]), (0.5, "YY", [0, 1])]
+    qubit = _initial_qubit()
+    exact = _exact(qubit, hamiltonian, 0.6)
+    calls = []
+    apply_gate = gquantum.qubit._apply_gate
+    monkeypatch.setattr(gquantum.qubit, "_apply_gate", lambda *args: calls.append(args) or apply_gate(*args))
+    qubit.evolve(hamiltonian, 0.6, 3, 1)
+    # XX and YY commute, so the evolution is exact; every change of basis between
+    # the groups and across steps is one gate per qubit
+    assert np.allclose(qubit.amplitudes.reshape(-1), exact)
+    assert len(calls) == 2 * (2 * 3 + 1)
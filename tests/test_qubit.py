@@ -0,0 +1,146 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+import gquantum.backend as backend
+from gquantum import Qubit
+from gquantum.backend import _SINGLE_QUBIT_GATES
+
+
+def _controlled_operator(num_qubits, gate, target, control_list):
+    operator = np.eye(2 ** num_qubits, dtype=np.complex128)
+    for state in range(2 ** num_qubits):
+        if all(state >> control & 1 for control in control_list):
+            operator[:, state] = 0
+            bit = state >> target & 1
+            for new_bit in (0, 1):
+                operator[(state & ~(1 << target)) | (new_bit << target), state] += gate[new_bit, bit]
+    return operator
+
+
+@pytest.mark.parametrize("dtype, atol", [(np.complex64, 1e-5), (np.complex128, 1e-12)])
+@pytest.mark.parametrize("block_qubits", [20, 2, 0])
+def test_gates_match_dense_operators(monkeypatch, dtype, atol, block_qubits):
+    monkeypatch.setattr(backend, "_BLOCK_QUBITS", block_qubits)
+    rng = np.random.default_rng(0)
+    num_qubits = 5
+    qubit = Qubit(num_qubits, dtype=dtype)
+    state = np.zeros(2 ** num_qubits, dtype=np.complex128)
+    state[0] = 1
+    for _ in range(60):
+        name = str(rng.choice(list(_SINGLE_QUBIT_GATES)))
+        target, *control_list = (int(i) for i in rng.choice(num_qubits, int(rng.integers(1, 4)), replace=False))
+        qubit.multi_controlled_gate(name, target, control_list)
+        state = _controlled_operator(num_qubits, _SINGLE_QUBIT_GATES[name], target, control_list) @ state
+        theta = float(rng.normal())
+        qubit.multi_controlled_ry(theta, target, control_list)
+        ry = np.array([[np.cos(theta / 2), -np.sin(theta / 2)], [np.sin(theta / 2), np.cos(theta / 2)]])
+        state = _controlled_operator(num_qubits, ry, target, control_list) @ state
+    assert qubit.amplitudes.dtype == dtype
+    assert np.allclose(qubit.amplitudes.reshape(-1), state, atol=atol)
+
+
+@pytest.mark.parametrize("dtype", [np.complex64, np.complex128])
+def test_measurement_keeps_dtype(dtype):
+    qubit = Qubit(3, dtype=dtype)
+    qubit.h(0)
+    qubit.cnot(0, 2)
+    qubit.measure_y(1)
+    qubit.multi_qubit_measure([0, 2])
+    assert qubit.amplitudes.dtype == dtype
+    assert np.isclose(np.linalg.norm(qubit.amplitudes), 1)
+
+
+def test_gates_on_every_axis():
+    qubit = Qubit(1)
+    qubit.h(0)
+    qubit.z(0)
+    assert np.allclose(qubit.amplitudes, [2 ** -0.5, -2 ** -0.5])
+    qubit = Qubit(3)
+    qubit.x(0)
+    qubit.x(1)
+    qubit.toffoli(0, 1, 2)
+    assert qubit.amplitudes[1, 1, 1] == 1
+
+
+def test_unsupported_dtype():
+    with pytest.raises(AssertionError):
+        Qubit(2, dtype=np.float64)
+
+
+def test_load_amplitudes_checks_dtype(tmp_path):
+    file = str(tmp_path / "amplitudes.npy")
+    np.save(file, np.ones((2, 2)))
+    qubit = Qubit(2)
+    with pytest.raises(AssertionError):
+        qubit.simulator_func_load_amplitudes(file)
+    qubit = Qubit(3, dtype=np.complex128)
+    qubit.h(1)
+    qubit.simulator_func_save_amplitudes(file)
+    loaded = Qubit(1)
+    loaded.simulator_func_load_amplitudes(file)
+    assert loaded.num_qubits == 3 and loaded.dtype == np.complex128
+    assert np.array_equal(loaded.amplitudes, qubit.amplitudes)
+
+
+def test_gate_table_is_shared_and_read_only():
+    assert Qubit(1)._single_qubit_gates is Qubit(2, dtype=np.complex128)._single_qubit_gates
+    with pytest.raises(ValueError):
+        _SINGLE_QUBIT_GATES["X"][0, 0] = 1
+    with pytest.raises(TypeError):
+        _SINGLE_QUBIT_GATES["X"] = np.eye(2)
+
+
+@pytest.mark.parametrize("block_qubits", [20, 2, 0])
+def test_measurement_statistics(monkeypatch, block_qubits):
+    monkeypatch.setattr(backend, "_BLOCK_QUBITS", block_qubits)
+    np.random.seed(0)
+    qubit = Qubit(4)
+    qubit.h(0)
+    qubit.cnot(0, 3)
+    qubit.ry(1.0, 1)
+    counts = qubit.simulator_func_multi_measure_without_collapse([3, 1, 0], 5000)
+    assert set(counts) == {'000', '010', '101', '111'}
+    probability_0 = np.cos(0.5) ** 2 / 2
+    assert abs(counts['000'] / 5000 - probability_0) < 0.03
+    assert abs(counts['111'] / 5000 - (0.5 - probability_0)) < 0.03
+
+
+@pytest.mark.parametrize("block_qubits", [20, 2, 0])
+def test_measure_never_returns_impossible_outcomes(monkeypatch, block_qubits):
+    monkeypatch.setattr(backend, "_BLOCK_QUBITS", block_qubits)
+    qubit = Qubit(5)
+    qubit.x(4)
+    qubit.h(1)
+    for _ in range(200):
+        result = qubit.simulator_func_multi_measure_without_collapse([4, 3, 2, 0], 1)
+        assert set(result) == {'1000'}
+
+
+@pytest.mark.parametrize("block_qubits", [20, 1])
+def test_collapse_matches_projection(monkeypatch, block_qubits):
+    monkeypatch.setattr(backend, "_BLOCK_QUBITS", block_qubits)
+    qubit = Qubit(4, dtype=np.complex128)
+    for i in range(4):
+        qubit.ry(0.4 + i, i)
+    qubit.cnot(1, 2)
+    expected = qubit.amplitudes.copy()
+    result = qubit.multi_qubit_measure([2, 0])
+    expected[:, 1 - int(result[0]), :, :] = 0
+    expected[:, :, :, 1 - int(result[1])] = 0
+    assert np.allclose(qubit.amplitudes, expected / np.linalg.norm(expected))
+
+
+def test_measure_and_collapse_stay_within_blocks(monkeypatch):
+    monkeypatch.setattr(backend, "_BLOCK_QUBITS", 12)
+    qubit = Qubit(17)
+    for i in range(17):
+        qubit.h(i)
+    tracemalloc.start()
+    qubit.multi_qubit_measure([0, 9])
+    qubit.measure(16)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    # a few block-sized buffers, far below the half-state temporaries used before
+    assert peak < qubit.amplitudes.nbytes / 4
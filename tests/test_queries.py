@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+import gquantum.backend as backend
+from gquantum import Qubit
+
+
+def _random_qubit(num_qubits, seed):
+    rng = np.random.default_rng(seed)
+    amplitudes = rng.normal(size=2 ** num_qubits) + 1j * rng.normal(size=2 ** num_qubits)
+    qubit = Qubit(num_qubits)
+    qubit.amplitudes = (amplitudes / np.linalg.norm(amplitudes)).astype(np.complex64).reshape((2,) * num_qubits)
+    return qubit
+
+
+@pytest.fixture(params=[20, 3, 1], ids=["one-block", "several-blocks", "tiny-blocks"])
+def block_qubits(request, monkeypatch):
+    monkeypatch.setattr(backend, "_BLOCK_QUBITS", request.param)
+    return request.param
+
+
+@pytest.mark.parametrize("k", [1, 4, 200])
+def test_top_probabilities(block_qubits, k):
+    qubit = _random_qubit(6, seed=k)
+    probabilities = np.abs(qubit.amplitudes.reshape(-1)) ** 2
+    expected = np.argsort(-probabilities, kind="stable")[:k]
+    result = qubit.simulator_func_top_probabilities(k)
+    assert [int(state, 2) for state, _ in result] == list(expected)
+    assert np.allclose([p for _, p in result], probabilities[expected])
+
+
+def test_top_probabilities_ties():
+    qubit = Qubit(2)
+    qubit.h(0)
+    qubit.cnot(0, 1)
+    result = qubit.simulator_func_top_probabilities(2)
+    assert [state for state, _ in result] == ['00', '11']
+
+
+@pytest.mark.parametrize("k", [1, 3, 9])
+def test_top_probabilities_uniform_ties(block_qubits, k):
+    qubit = Qubit(4)
+    for i in range(4):
+        qubit.h(i)
+    result = qubit.simulator_func_top_probabilities(k)
+    assert [state for state, _ in result] == [np.binary_repr(i, width=4) for i in range(k)]
+
+
+def test_get_amplitudes_by_bitstrings():
+    qubit = _random_qubit(4, seed=0)
+    flat = qubit.amplitudes.reshape(-1)
+    result = qubit.simulator_func_get_amplitudes_by_bitstrings(['0000', '1011', '0100'])
+    assert np.array_equal(result, flat[[0b0000, 0b1011, 0b0100]])
+
+
+@pytest.mark.parametrize("bitstring", ['0b1', '1_0', '012', '01'])
+def test_get_amplitudes_by_bitstrings_rejects_invalid(bitstring):
+    qubit = Qubit(3)
+    with pytest.raises(AssertionError):
+        qubit.simulator_func_get_amplitudes_by_bitstrings([bitstring])
+
+
+@pytest.mark.parametrize("qubit_index_list", [[0], [5], [4, 1], [0, 5, 2], [3, 4, 5]])
+def test_reduced_density_matrix(block_qubits, qubit_index_list):
+    num_qubits = 6
+    qubit = _random_qubit(num_qubits, seed=len(qubit_index_list))
+    kept_axes = sorted(num_qubits - i - 1 for i in qubit_index_list)
+    state = np.moveaxis(qubit.amplitudes, kept_axes, range(len(kept_axes))).reshape(2 ** len(kept_axes), -1)
+    result = qubit.simulator_func_reduced_density_matrix(qubit_index_list)
+    assert np.allclose(result, state @ state.conj().T, atol=1e-6)
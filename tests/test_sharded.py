@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+from multiprocessing import shared_memory
+
+import gquantum.sharded
+from gquantum import Qubit, ShardedQubit
+from gquantum.backend import _collapse
+
+
+def _apply_both(qubit, sharded_qubit, method, *args):
+    getattr(qubit, method)(*args)
+    getattr(sharded_qubit, method)(*args)
+
+
+def _random_circuit(qubit, sharded_qubit, num_gates, rng):
+    num_qubits = qubit.num_qubits
+    for _ in range(num_gates):
+        a, b, c = (int(i) for i in rng.choice(num_qubits, 3, replace=False))
+        theta = float(rng.normal())
+        gate = rng.integers(8)
+        if gate == 0:
+            _apply_both(qubit, sharded_qubit, "h", a)
+        elif gate == 1:
+            _apply_both(qubit, sharded_qubit, "cnot", a, b)
+        elif gate == 2:
+            _apply_both(qubit, sharded_qubit, "toffoli", a, b, c)
+        elif gate == 3:
+            _apply_both(qubit, sharded_qubit, "rx", theta, a)
+        elif gate == 4:
+            _apply_both(qubit, sharded_qubit, "multi_controlled_ry", theta, a, [b])
+        elif gate == 5:
+            _apply_both(qubit, sharded_qubit, "multi_controlled_gate", "T", a, [b, c])
+        elif gate == 6:
+            _apply_both(qubit, sharded_qubit, "swap", a, b)
+        else:
+            _apply_both(qubit, sharded_qubit, "y", a)
+
+
+@pytest.mark.parametrize("num_global_qubits", [1, 2, 3])
+def test_random_circuit_matches_qubit(num_global_qubits):
+    rng = np.random.default_rng(num_global_qubits)
+    qubit = Qubit(5)
+    with ShardedQubit(5, num_global_qubits) as sharded_qubit:
+        _random_circuit(qubit, sharded_qubit, 80, rng)
+        assert np.allclose(sharded_qubit.simulator_func_get_amplitudes(), qubit.amplitudes, atol=1e-5)
+
+
+def test_exchange_in_several_blocks(monkeypatch):
+    # the workers are forked, so they see the smaller block size
+    monkeypatch.setattr(gquantum.sharded, "_BLOCK_QUBITS", 1)
+    rng = np.random.default_rng(7)
+    qubit = Qubit(6)
+    with ShardedQubit(6, 2) as sharded_qubit:
+        _random_circuit(qubit, sharded_qubit, 60, rng)
+        assert np.allclose(sharded_qubit.simulator_func_get_amplitudes(), qubit.amplitudes, atol=1e-5)
+
+
+def test_global_target_and_controls():
+    qubit = Qubit(4)
+    with ShardedQubit(4, 2) as sharded_qubit:
+        # qubits 2 and 3 start on the global positions
+        _apply_both(qubit, sharded_qubit, "h", 3)
+        _apply_both(qubit, sharded_qubit, "h", 0)
+        _apply_both(qubit, sharded_qubit, "cnot", 3, 1)
+        _apply_both(qubit, sharded_qubit, "cnot", 0, 2)
+        _apply_both(qubit, sharded_qubit, "multi_controlled_rz", 0.7, 1, [2, 3])
+        assert np.allclose(sharded_qubit.simulator_func_get_amplitudes(), qubit.amplitudes, atol=1e-6)
+
+
+def test_all_local_positions_busy():
+    qubit = Qubit(4)
+    with ShardedQubit(4, 2) as sharded_qubit:
+        _apply_both(qubit, sharded_qubit, "h", 0)
+        _apply_both(qubit, sharded_qubit, "h", 1)
+        _apply_both(qubit, sharded_qubit, "h", 3)
+        # both local positions hold controls, so one of them has to become global
+        _apply_both(qubit, sharded_qubit, "toffoli", 0, 1, 2)
+        _apply_both(qubit, sharded_qubit, "multi_controlled_ry", 0.4, 3, [0, 1])
+        assert np.allclose(sharded_qubit.simulator_func_get_amplitudes(), qubit.amplitudes, atol=1e-6)
+
+
+def test_single_local_qubit():
+    qubit = Qubit(3)
+    with ShardedQubit(3, 2) as sharded_qubit:
+        _apply_both(qubit, sharded_qubit, "h", 0)
+        _apply_both(qubit, sharded_qubit, "toffoli", 0, 1, 2)
+        _apply_both(qubit, sharded_qubit, "h", 2)
+        assert np.allclose(sharded_qubit.simulator_func_get_amplitudes(), qubit.amplitudes, atol=1e-6)
+
+
+def test_swap_only_remaps():
+    qubit = Qubit(4)
+    with ShardedQubit(4, 1) as sharded_qubit:
+        _apply_both(qubit, sharded_qubit, "x", 0)
+        _apply_both(qubit, sharded_qubit, "swap", 0, 3)
+        assert sharded_qubit._physical == [3, 1, 2, 0]
+        assert np.allclose(sharded_qubit.simulator_func_get_amplitudes(), qubit.amplitudes)
+
+
+@pytest.mark.parametrize("measured_qubit", [0, 1, 4])
+def test_measure_local_and_global(measured_qubit):
+    rng = np.random.default_rng(measured_qubit)
+    qubit = Qubit(5)
+    with ShardedQubit(5, 2) as sharded_qubit:
+        _random_circuit(qubit, sharded_qubit, 40, rng)
+        for qubit_index in (measured_qubit, 3):
+            result = sharded_qubit.measure(qubit_index)
+            _collapse(qubit.amplitudes, [qubit_index], [result])
+            assert np.allclose(sharded_qubit.simulator_func_get_amplitudes(), qubit.amplitudes, atol=1e-5)
+
+
+def test_measure_definite_states():
+    with ShardedQubit(3, 1) as sharded_qubit:
+        sharded_qubit.x(2)
+        sharded_qubit.cnot(2, 0)
+        assert [sharded_qubit.measure(i) for i in range(3)] == ['1', '0', '1']
+
+
+def test_close_frees_segments():
+    sharded_qubit = ShardedQubit(4, 2)
+    sharded_qubit.h(3)
+    sharded_qubit.cnot(3, 0)
+    sharded_qubit.simulator_func_get_amplitudes()
+    segment_names = list(sharded_qubit._segment_names)
+    sharded_qubit.close()
+    for name in segment_names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)